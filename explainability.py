@@ -6,16 +6,23 @@ Provides SHAP, LIME, and Counterfactual explanations
 import os
 import json
 import time
+import tempfile
+import threading
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
-import pandas as pd
+from flask import Blueprint, request, jsonify, current_app
 import numpy as np
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
 import warnings
 warnings.filterwarnings('ignore')
 
 # Feature flags: keep heavy explainers off by default on Render
 USE_SHAP = os.environ.get('USE_SHAP', '0') == '1'
 USE_LIME = os.environ.get('USE_LIME', '0') == '1'
+# Warm explainability caches in the background when the blueprint is registered.
+# Off by default so tests and scripts importing app don't write the cache file;
+# the Docker image turns it on for the gunicorn server.
+WARM_CACHES = os.environ.get('WARM_EXPLAIN_CACHES', '0') == '1'
 
 # Lazy import to avoid circular dependency
 def get_model_components():
@@ -23,37 +30,170 @@ def get_model_components():
     from app import model, scaler, feature_columns, preprocess_input
     return model, scaler, feature_columns, preprocess_input
 
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
-    SHAP_AVAILABLE = False
-
 try:
     from lime import lime_tabular
     LIME_AVAILABLE = True
 except ImportError:
     LIME_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 explain_bp = Blueprint('explain', __name__)
 
 # Cache file path
 CACHE_FILE = 'explain_global_cache.json'
 CACHE_TTL_DAYS = 7
 
+# Seeded generator for synthetic background data (reproducible across restarts)
+_RNG = np.random.default_rng(42)
+
+# In-process caches for the synthetic background and LIME explainer.
+# Entries are keyed by the identity of the loaded model/scaler so a model
+# reload invalidates them.
+_CACHE_LOCK = threading.RLock()
+_BG_CACHE = None
+_LIME_EXPLAINER = None
+_SCALER_PARAMS = None
+_LINEAR_PARAMS = None
+
+# Regressors whose predict() is exactly X @ coef_ + intercept_ (identity link).
+# Other models with a 1-D coef_ (e.g. PoissonRegressor) must use model.predict.
+IDENTITY_LINEAR_MODELS = (LinearRegression, Ridge, Lasso, ElasticNet)
+_FEATCOL_LOOKUP = None
+_ACTIONABLE_IDX = None
+
+# Actionable numeric features explored by counterfactual search
+ACTIONABLE_FEATURES = [
+    'Age', 'Service time', 'Work load Average/day ',
+    'Transportation expense', 'Distance from Residence to Work'
+]
+
+# Perturbation samples drawn by LIME per explanation (LIME's default is 5000)
+LIME_NUM_SAMPLES = 1000
+
+# (mtime, parsed contents) of CACHE_FILE, revalidated against the file's
+# mtime; always replaced as a whole so readers never see a mixed pair
+_GLOBAL_MEM_CACHE = (0, None)
+
+
+def _components_key():
+    """Identity key of the currently loaded model and scaler"""
+    model, scaler, _, _ = get_model_components()
+    return (id(model), id(scaler))
+
+
+def _get_scaler_params(scaler):
+    """
+    Get cached (mean, 1 / scale) arrays of a fitted StandardScaler, or None
+    for any other scaler (which must go through scaler.transform)
+    """
+    global _SCALER_PARAMS
+    # Keyed on the scaler object itself (not id()) so a freed scaler's id
+    # can never be reused by another one
+    cached = _SCALER_PARAMS
+    if cached is not None and cached[0] is scaler:
+        return cached[1]
+    
+    params = None
+    if isinstance(scaler, StandardScaler) and hasattr(scaler, 'n_features_in_'):
+        n_features = scaler.n_features_in_
+        # with_mean=False still stores mean_, but transform doesn't center
+        mean = np.zeros(n_features)
+        if scaler.with_mean and scaler.mean_ is not None:
+            mean = np.asarray(scaler.mean_, dtype=np.float64)
+        inv_scale = np.ones(n_features)
+        if scaler.with_std and scaler.scale_ is not None:
+            inv_scale = 1.0 / np.asarray(scaler.scale_, dtype=np.float64)
+        params = (mean.astype(np.float32), inv_scale.astype(np.float32))
+    _SCALER_PARAMS = (scaler, params)
+    return params
+
+
+def _get_linear_params(model):
+    """
+    Get cached float32 (coef, intercept, identity_link) of a fitted model
+    with a 1-D coef_, or None
+    """
+    global _LINEAR_PARAMS
+    # Keyed on the model object itself (not id()) so a freed model's id can
+    # never be reused by another one
+    cached = _LINEAR_PARAMS
+    if cached is not None and cached[0] is model:
+        return cached[1]
+    
+    params = None
+    coef = getattr(model, 'coef_', None)
+    if coef is not None and np.ndim(coef) == 1:
+        intercept = float(np.ravel(getattr(model, 'intercept_', 0.0))[0])
+        identity_link = isinstance(model, IDENTITY_LINEAR_MODELS)
+        params = (np.ascontiguousarray(coef, dtype=np.float32), intercept, identity_link)
+    _LINEAR_PARAMS = (model, params)
+    return params
+
+
+def _get_linear_coef(model, n_features):
+    """Get the cached coefficient vector if the model has one over n_features"""
+    params = _get_linear_params(model)
+    if params is None or len(params[0]) != n_features:
+        return None
+    return params[0]
+
+
+def _get_identity_linear_coef(model, n_features):
+    """Get the cached coefficients if predict() is exactly x @ coef + intercept"""
+    params = _get_linear_params(model)
+    if params is None or not params[2] or len(params[0]) != n_features:
+        return None
+    return params[0]
+
+
+def predict_row(model, row):
+    """Predict a single scaled row, in closed form for identity-link linear models"""
+    coef = _get_identity_linear_coef(model, len(row))
+    if coef is not None:
+        return float(row @ coef + _get_linear_params(model)[1])
+    return float(model.predict(row.reshape(1, -1))[0])
+
+
+def scale_input(scaler, processed_data):
+    """
+    Standardize preprocessed input with the scaler's fitted statistics.
+    For a StandardScaler this matches scaler.transform (in float32) without
+    sklearn's per-call validation; other scalers use scaler.transform.
+    """
+    params = _get_scaler_params(scaler)
+    if params is None:
+        return scaler.transform(processed_data)
+    
+    mean, inv_scale = params
+    return (np.asarray(processed_data, dtype=np.float32) - mean) * inv_scale
+
 
 def generate_background_data(n_samples=100):
     """
-    Generate synthetic background data for SHAP explainer.
+    Generate synthetic background data for SHAP and LIME explanations.
     Creates samples based on typical feature ranges.
     """
-    _, _, feature_columns, preprocess_input = get_model_components()
+    _, _, feature_columns, _ = get_model_components()
     if feature_columns is None or len(feature_columns) == 0:
         return None
     
     # Create synthetic data based on known feature ranges
-    # These ranges are typical for the absenteeism dataset
-    synthetic_data = {}
+    # These ranges are typical for the absenteeism dataset.
+    # Samples are written straight into a (n_samples, n_features) array
+    # laid out in feature_columns order.
+    col_idx = {col: i for i, col in enumerate(feature_columns)}
+    background_samples = np.zeros((n_samples, len(feature_columns)), dtype=np.float32)
     
     # Numeric features (approximate ranges from dataset)
     numeric_features = {
@@ -66,97 +206,113 @@ def generate_background_data(n_samples=100):
     
     # Add numeric features
     for feat, (min_val, max_val) in numeric_features.items():
-        if feat in feature_columns:
-            synthetic_data[feat] = np.random.uniform(min_val, max_val, n_samples)
+        if feat in col_idx:
+            background_samples[:, col_idx[feat]] = _RNG.uniform(min_val, max_val, n_samples)
     
-    # Add categorical features with typical values
-    categorical_defaults = {
-        'Education': [1, 2, 3],
-        'Son': [0, 1, 2, 3],
-        'Month of absence': list(range(1, 13)),
-        'Day of the week': [2, 3, 4, 5, 6],
-        'Seasons': [1, 2, 3, 4],
-        'Hit target': [0, 1],
-        'Disciplinary failure': [0, 1],
-        'Social drinker': [0, 1],
-        'Social smoker': [0, 1],
-        'Pet': [0, 1],
-        'Reason for absence': [0, 5, 10, 15, 20, 25]
-    }
-    
-    for feat, values in categorical_defaults.items():
-        if feat in feature_columns:
-            synthetic_data[feat] = np.random.choice(values, n_samples)
-    
-    # Create DataFrame
-    df = pd.DataFrame(synthetic_data)
-    
-    # Preprocess to match model format (one-hot encoding, etc.)
-    processed = preprocess_input(df.iloc[0].to_dict())
-    
-    # Generate multiple samples by varying values
-    background_samples = []
-    for i in range(n_samples):
-        sample = {}
-        # Vary numeric features
-        for feat, (min_val, max_val) in numeric_features.items():
-            if feat in feature_columns:
-                sample[feat] = np.random.uniform(min_val, max_val)
-        
-        # Vary categorical features
-        for feat, values in categorical_defaults.items():
-            if feat in feature_columns:
-                sample[feat] = np.random.choice(values)
-        
-        processed_sample = preprocess_input(sample)
-        if len(background_samples) == 0:
-            # Initialize with first sample
-            background_samples = processed_sample.values
-        else:
-            background_samples = np.vstack([background_samples, processed_sample.values])
+    # Categorical dummy columns are left at zero, matching how
+    # preprocess_input encodes a single request
     
     # Scale the background data
     _, scaler, _, _ = get_model_components()
     if scaler is not None:
-        background_scaled = scaler.transform(background_samples)
+        background_scaled = scale_input(scaler, background_samples)
         return background_scaled
     
     return background_samples
 
 
-def get_shap_explainer():
-    """Get or create SHAP explainer with caching"""
-    if not SHAP_AVAILABLE or not USE_SHAP:
-        # SHAP not available; caller should use coefficient-based fallback
-        return None
+def get_background_data(n_samples=100):
+    """Get background data, generating it once per loaded model"""
+    global _BG_CACHE
+    key = _components_key() + (n_samples,)
+    cached = _BG_CACHE
+    if cached is not None and cached[0] == key:
+        return cached[1]
     
-    model, scaler, _, _ = get_model_components()
-    if model is None or scaler is None:
-        return None
+    with _CACHE_LOCK:
+        if _BG_CACHE is None or _BG_CACHE[0] != key:
+            _BG_CACHE = (key, generate_background_data(n_samples=n_samples))
+        return _BG_CACHE[1]
+
+
+def get_lime_explainer():
+    """Get or create LIME explainer with caching"""
+    global _LIME_EXPLAINER
+    key = _components_key()
+    cached = _LIME_EXPLAINER
+    if cached is not None and cached[0] == key:
+        return cached[1]
     
-    # For LinearRegression, use LinearExplainer (exact and fast)
-    if hasattr(model, 'coef_'):
-        # Generate background data
-        background = generate_background_data(n_samples=100)
-        if background is not None:
-            try:
-                explainer = shap.LinearExplainer(model, background)
-                return explainer
-            except Exception as e:
-                print(f"Error creating SHAP explainer: {e}")
-                return None
+    with _CACHE_LOCK:
+        if _LIME_EXPLAINER is None or _LIME_EXPLAINER[0] != key:
+            explainer = None
+            _, _, feature_columns, _ = get_model_components()
+            background = get_background_data(n_samples=100)
+            if LIME_AVAILABLE and background is not None:
+                explainer = lime_tabular.LimeTabularExplainer(
+                    background,
+                    feature_names=feature_columns,
+                    mode='regression',
+                    discretize_continuous=False,
+                    sample_around_instance=True
+                )
+            _LIME_EXPLAINER = (key, explainer)
+        return _LIME_EXPLAINER[1]
+
+
+def _get_feature_lookup(feature_columns):
+    """Map LIME feature identifiers (name, index or index string) to column names"""
+    global _FEATCOL_LOOKUP
+    cached = _FEATCOL_LOOKUP
+    if cached is not None and cached[0] == id(feature_columns):
+        return cached[1]
+    
+    lookup = {col: col for col in feature_columns}
+    lookup.update({str(i): col for i, col in enumerate(feature_columns)})
+    lookup.update({i: col for i, col in enumerate(feature_columns)})
+    _FEATCOL_LOOKUP = (id(feature_columns), lookup)
+    return lookup
+
+
+def _get_actionable_idx(feature_columns):
+    """Map actionable features to their column index in feature_columns"""
+    global _ACTIONABLE_IDX
+    cached = _ACTIONABLE_IDX
+    if cached is not None and cached[0] == id(feature_columns):
+        return cached[1]
     
-    return None
+    actionable_idx = {
+        feat: feature_columns.index(feat)
+        for feat in ACTIONABLE_FEATURES if feat in feature_columns
+    }
+    _ACTIONABLE_IDX = (id(feature_columns), actionable_idx)
+    return actionable_idx
 
 
 def load_cached_global_explanation():
     """Load cached global explanation if valid"""
-    if not os.path.exists(CACHE_FILE):
+    global _GLOBAL_MEM_CACHE
+    try:
+        mtime = os.path.getmtime(CACHE_FILE)
+    except OSError:
+        return None
+    
+    # The file is rewritten on every save, so an old mtime means an expired
+    # cache; skip reading and parsing it entirely
+    if time.time() - mtime > CACHE_TTL_DAYS * 86400:
         return None
     
     try:
-        with open(CACHE_FILE, 'r') as f:
-            cache_data = json.load(f)
+        # Only re-parse the file when it has changed since the last read
+        cached_mtime, cache_data = _GLOBAL_MEM_CACHE
+        if cached_mtime != mtime or cache_data is None:
+            if ORJSON_AVAILABLE:
+                with open(CACHE_FILE, 'rb') as f:
+                    cache_data = orjson.loads(f.read())
+            else:
+                with open(CACHE_FILE, 'r') as f:
+                    cache_data = json.load(f)
+            _GLOBAL_MEM_CACHE = (mtime, cache_data)
         
         # Check if cache is still valid (within TTL)
         cache_time = datetime.fromisoformat(cache_data.get('timestamp', '2000-01-01'))
@@ -169,16 +325,114 @@ def load_cached_global_explanation():
 
 
 def save_cached_global_explanation(explanation):
-    """Save global explanation to cache"""
+    """Save global explanation to cache (atomically)"""
+    global _GLOBAL_MEM_CACHE
+    tmp_file = None
     try:
         cache_data = {
             'timestamp': datetime.now().isoformat(),
             'explanation': explanation
         }
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(cache_data, f, indent=2)
+        # Each writer gets its own temp file in the cache's directory so
+        # concurrent saves can't truncate each other before os.replace
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(CACHE_FILE) or '.',
+            prefix=os.path.basename(CACHE_FILE) + '.',
+            suffix='.tmp'
+        )
+        if ORJSON_AVAILABLE:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps(cache_data, option=orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cache_data, f, separators=(',', ':'))
+        mtime = os.stat(tmp_file).st_mtime
+        os.replace(tmp_file, CACHE_FILE)
+        tmp_file = None
+        
+        _GLOBAL_MEM_CACHE = (mtime, cache_data)
     except Exception as e:
         print(f"Error saving cache: {e}")
+    finally:
+        if tmp_file is not None and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def json_response(payload):
+    """Serialize payload to a JSON response, using orjson when available"""
+    if not ORJSON_AVAILABLE:
+        return jsonify(payload)
+    return current_app.response_class(
+        orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        mimetype='application/json'
+    )
+
+
+def _cf_search(base_pred, coef, feat_idxs, stds, deltas):
+    """
+    Score single-feature counterfactual deltas for a linear model.
+    Returns an (N, 4) array of (feature position, change, new prediction,
+    L2 distance) rows, ordered by feature then delta.
+    """
+    n_deltas = deltas.shape[0]
+    out = np.empty((feat_idxs.shape[0] * n_deltas, 4))
+    k = 0
+    for i in range(feat_idxs.shape[0]):
+        feat = feat_idxs[i]
+        for j in range(n_deltas):
+            change = deltas[j] * stds[i]
+            out[k, 0] = i
+            out[k, 1] = change
+            out[k, 2] = base_pred + coef[feat] * change
+            # Only one feature changes, so the L2 distance is |change|
+            out[k, 3] = abs(change)
+            k += 1
+    return out
+
+
+if NUMBA_AVAILABLE:
+    _cf_search = njit(cache=True)(_cf_search)
+
+
+def compute_global_explanation(model, feature_columns):
+    """Compute global feature importance (SHAP or coefficient-based)"""
+    explainer_type = 'CoefficientFallback'
+    mean_abs_shap = None
+    coef = _get_linear_coef(model, len(feature_columns))
+
+    if USE_SHAP and coef is not None:
+        # For a linear model, SHAP values with an independent masker are
+        # coef_i * (x_i - E[x_i]), so mean |SHAP| over the background is
+        # computed in closed form without building a shap explainer
+        background = get_background_data(n_samples=100)
+        if background is not None:
+            deviations = np.abs(background - background.mean(axis=0))
+            mean_abs_shap = np.abs(coef) * deviations.mean(axis=0)
+            explainer_type = 'LinearClosedForm'
+
+    if mean_abs_shap is None:
+        # Fallback: approximate global importance using absolute model coefficients
+        if coef is not None:
+            mean_abs_shap = np.abs(coef)
+        else:
+            return None
+
+    # Create feature importance list (SHAP or coefficient-based)
+    feature_importance = [
+        {'feature': feature, 'mean_abs_shap': importance}
+        for feature, importance in zip(feature_columns, mean_abs_shap.tolist())
+    ]
+    
+    # Sort by importance
+    feature_importance.sort(key=lambda x: x['mean_abs_shap'], reverse=True)
+    
+    explanation = {
+        'feature_importance': feature_importance,
+        'explainer_type': explainer_type,
+        'sample_size': int(len(feature_importance)),
+        'cached': False
+    }
+    return explanation
 
 
 @explain_bp.route('/global', methods=['GET'])
@@ -190,63 +444,27 @@ def explain_global():
     try:
         model, scaler, feature_columns, preprocess_input = get_model_components()
         if model is None or scaler is None or feature_columns is None:
-            return jsonify({'error': 'Model not loaded'}), 500
+            return json_response({'error': 'Model not loaded'}), 500
         
         # Check cache first
         cached = load_cached_global_explanation()
         if cached is not None:
-            return jsonify({
+            return json_response({
                 **cached,
                 'cached': True
             })
         
-        feature_importance = None
-        explainer = None
-        mean_abs_shap = None
-
-        if SHAP_AVAILABLE and USE_SHAP:
-            explainer = get_shap_explainer()
-            if explainer is not None:
-                # Get background data for computing mean SHAP values
-                background = generate_background_data(n_samples=100)
-                if background is not None:
-                    # Compute SHAP values for background data (mean importance)
-                    shap_values = explainer.shap_values(background)
-                    mean_abs_shap = np.mean(np.abs(shap_values), axis=0)
-
-        if mean_abs_shap is None:
-            # Fallback: approximate global importance using absolute model coefficients
-            if hasattr(model, 'coef_') and len(model.coef_) == len(feature_columns):
-                mean_abs_shap = np.abs(model.coef_)
-            else:
-                return jsonify({'error': 'Unable to compute global importance'}), 500
-
-        # Create feature importance list (SHAP or coefficient-based)
-        feature_importance = [
-            {
-                'feature': feature_columns[i],
-                'mean_abs_shap': float(mean_abs_shap[i])
-            }
-            for i in range(len(feature_columns))
-        ]
-        
-        # Sort by importance
-        feature_importance.sort(key=lambda x: x['mean_abs_shap'], reverse=True)
-        
-        explanation = {
-            'feature_importance': feature_importance,
-            'explainer_type': 'LinearExplainer' if SHAP_AVAILABLE and explainer is not None else 'CoefficientFallback',
-            'sample_size': int(len(feature_importance)),
-            'cached': False
-        }
+        explanation = compute_global_explanation(model, feature_columns)
+        if explanation is None:
+            return json_response({'error': 'Unable to compute global importance'}), 500
         
         # Save to cache
         save_cached_global_explanation(explanation)
         
-        return jsonify(explanation)
+        return json_response(explanation)
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 
 @explain_bp.route('/local', methods=['POST'])
@@ -259,59 +477,46 @@ def explain_local():
     try:
         model, scaler, feature_columns, preprocess_input = get_model_components()
         if model is None or scaler is None or feature_columns is None:
-            return jsonify({'error': 'Model not loaded'}), 500
+            return json_response({'error': 'Model not loaded'}), 500
 
         data = request.json or {}
         input_data = data.get('input', {})
 
         # Preprocess input (robust to missing fields)
         processed_data = preprocess_input(input_data)
-        scaled_data = scaler.transform(processed_data)
+        scaled_data = scale_input(scaler, processed_data)
 
         # Make prediction
-        prediction = float(model.predict(scaled_data)[0])
-
-        contributions = None
-
-        if SHAP_AVAILABLE and USE_SHAP:
-            explainer = get_shap_explainer()
-            if explainer is not None:
-                try:
-                    shap_values = explainer.shap_values(scaled_data[0])
-                    contributions = [
-                        {
-                            'feature': feature_columns[i],
-                            'shap': float(shap_values[i]),
-                            'value': float(scaled_data[0][i])
-                        }
-                        for i in range(len(feature_columns))
-                    ]
-                except Exception:
-                    contributions = None
-
-        if contributions is None:
-            # Fallback: coefficient * value
-            if hasattr(model, 'coef_') and len(model.coef_) == len(feature_columns):
-                contributions = [
-                    {
-                        'feature': feature_columns[i],
-                        'shap': float(model.coef_[i] * scaled_data[0][i]),
-                        'value': float(scaled_data[0][i])
-                    }
-                    for i in range(len(feature_columns))
-                ]
+        prediction = predict_row(model, scaled_data[0])
+
+        shap_values = None
+        coef = _get_linear_coef(model, len(feature_columns))
+
+        if USE_SHAP and coef is not None:
+            # Closed-form linear SHAP: coef_i * (x_i - E[x_i]) over the background
+            background = get_background_data(n_samples=100)
+            if background is not None:
+                shap_values = coef * (scaled_data[0] - background.mean(axis=0))
+
+        if shap_values is None:
+            if coef is not None:
+                # Fallback: coefficient * value
+                shap_values = coef * scaled_data[0]
             else:
                 # Last-resort fallback: zeros
-                contributions = [
-                    {
-                        'feature': feature_columns[i],
-                        'shap': 0.0,
-                        'value': float(scaled_data[0][i]) if len(scaled_data[0]) > i else 0.0
-                    }
-                    for i in range(len(feature_columns))
-                ]
-
-        contributions.sort(key=lambda x: abs(x['shap']), reverse=True)
+                shap_values = np.zeros(len(feature_columns))
+
+        # Convert whole arrays with tolist() instead of casting each element
+        values = scaled_data[0].tolist()
+        values += [0.0] * (len(feature_columns) - len(values))
+        shap_list = shap_values.tolist()
+
+        # Rank by |SHAP| with a stable numpy argsort rather than a Python key callback
+        order = np.argsort(-np.abs(shap_values), kind='stable').tolist()
+        contributions = [
+            {'feature': feature_columns[i], 'shap': shap_list[i], 'value': values[i]}
+            for i in order
+        ]
 
         top_features = contributions[:3]
         summary_parts = []
@@ -321,7 +526,7 @@ def explain_local():
 
         text_summary = f"Predicted {prediction:.2f} hours. Top factors: {', '.join(summary_parts)}."
 
-        return jsonify({
+        return json_response({
             'prediction': prediction,
             'contributions': contributions,
             'text_summary': text_summary
@@ -338,20 +543,20 @@ def explain_local():
                     {'feature': feature_columns[i], 'shap': 0.0, 'value': 0.0}
                     for i in range(len(feature_columns))
                 ]
-                return jsonify({
+                return json_response({
                     'prediction': pred,
                     'contributions': contributions,
                     'text_summary': f'Fallback used: {str(e)}'
                 })
         except Exception:
             # Absolute last resort static response
-            return jsonify({
+            return json_response({
                 'prediction': 0.0,
                 'contributions': [],
                 'text_summary': 'Fallback used.'
             })
         # Should not reach here, but still return 200 with fallback text
-        return jsonify({
+        return json_response({
             'prediction': 0.0,
             'contributions': [],
             'text_summary': 'Fallback used.'
@@ -368,41 +573,33 @@ def explain_lime():
     try:
         model, scaler, feature_columns, preprocess_input = get_model_components()
         if model is None or scaler is None or feature_columns is None:
-            return jsonify({'error': 'Model not loaded'}), 500
+            return json_response({'error': 'Model not loaded'}), 500
 
         data = request.json or {}
         input_data = data.get('input', {})
 
         processed_data = preprocess_input(input_data)
-        scaled_data = scaler.transform(processed_data)
-        prediction = float(model.predict(scaled_data)[0])
+        scaled_data = scale_input(scaler, processed_data)
+        prediction = predict_row(model, scaled_data[0])
 
         # Prefer real LIME if available; otherwise provide a deterministic fallback
         if LIME_AVAILABLE and USE_LIME:
             try:
-                background = generate_background_data(n_samples=100)
-                explainer = lime_tabular.LimeTabularExplainer(
-                    background,
-                    feature_names=feature_columns,
-                    mode='regression',
-                    discretize_continuous=False
-                )
+                explainer = get_lime_explainer()
+                if explainer is None:
+                    raise ValueError('LIME explainer unavailable')
                 explanation = explainer.explain_instance(
                     scaled_data[0],
                     model.predict,
-                    num_features=10
+                    num_features=10,
+                    num_samples=LIME_NUM_SAMPLES
                 )
+                feature_lookup = _get_feature_lookup(feature_columns)
                 top_features = []
                 for feature_idx, weight in explanation.as_list():
-                    feature_name = None
-                    for i, col in enumerate(feature_columns):
-                        if str(i) == str(feature_idx) or col == feature_idx:
-                            feature_name = col
-                            break
-                    if feature_name is None:
-                        feature_name = str(feature_idx)
+                    feature_name = feature_lookup.get(feature_idx, str(feature_idx))
                     top_features.append({'feature': feature_name, 'weight': float(weight)})
-                return jsonify({
+                return json_response({
                     'prediction': prediction,
                     'top_features': top_features,
                     'explanation_score': float(explanation.score)
@@ -411,26 +608,24 @@ def explain_lime():
                 pass
 
         # Fallback: coefficient-based importance
-        if hasattr(model, 'coef_') and len(model.coef_) == len(feature_columns):
+        coef = _get_linear_coef(model, len(feature_columns))
+        if coef is not None:
             weights = [
-                {
-                    'feature': feature_columns[i],
-                    'weight': float(model.coef_[i] * scaled_data[0][i])
-                }
-                for i in range(len(feature_columns))
+                {'feature': feature, 'weight': weight}
+                for feature, weight in zip(feature_columns, (coef * scaled_data[0]).tolist())
             ]
             # sort by absolute weight and keep top 10
             weights.sort(key=lambda x: abs(x['weight']), reverse=True)
-            return jsonify({
+            return json_response({
                 'prediction': prediction,
                 'top_features': weights[:10],
                 'explanation_score': 1.0
             })
 
-        return jsonify({'error': 'Unable to compute LIME explanation'}), 500
+        return json_response({'error': 'Unable to compute LIME explanation'}), 500
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return json_response({'error': str(e)}), 400
 
 
 @explain_bp.route('/cf', methods=['POST'])
@@ -443,75 +638,73 @@ def explain_counterfactual():
     try:
         model, scaler, feature_columns, preprocess_input = get_model_components()
         if model is None or scaler is None or feature_columns is None:
-            return jsonify({'error': 'Model not loaded'}), 500
+            return json_response({'error': 'Model not loaded'}), 500
         
         data = request.json
         if 'input' not in data:
-            return jsonify({'error': 'Missing "input" field in request'}), 400
+            return json_response({'error': 'Missing "input" field in request'}), 400
         
         input_data = data['input']
         target_factor = data.get('target', 0.8)  # Default: reduce by 20%
         
         # Preprocess input
         processed_data = preprocess_input(input_data)
-        scaled_data = scaler.transform(processed_data)
+        scaled_data = scale_input(scaler, processed_data)
         
-        # Get original prediction
-        original_pred = model.predict(scaled_data)[0]
+        # Get original prediction (linear models need no predict call)
+        original_pred = predict_row(model, scaled_data[0])
         target_pred = original_pred * target_factor
         
-        # Identify actionable numeric features
-        actionable_features = [
-            'Age', 'Service time', 'Work load Average/day ', 
-            'Transportation expense', 'Distance from Residence to Work'
-        ]
+        # Find actionable feature indices in processed data
+        feature_mapping = _get_actionable_idx(feature_columns)
         
-        # Find feature indices in processed data
-        feature_mapping = {}
-        for feat in actionable_features:
-            if feat in feature_columns:
-                idx = feature_columns.index(feat)
-                feature_mapping[feat] = idx
+        # Try different deltas: ±0.5σ, ±1σ, ±2σ
+        # In scaled space, use unit standard deviation to propose deltas
+        feat_std = 1.0
+        delta_mults = [-0.5, -1.0, -2.0, 0.5, 1.0, 2.0]
+        feature_items = [
+            (feat_name, feat_idx) for feat_name, feat_idx in feature_mapping.items()
+            if feat_idx < len(scaled_data[0])
+        ]
         
         candidates = []
-        
-        # Try different deltas: ±0.5σ, ±1σ, ±2σ
-        for feat_name, feat_idx in feature_mapping.items():
-            if feat_idx >= len(scaled_data[0]):
-                continue
+        if feature_items:
+            feat_idxs = np.array([feat_idx for _, feat_idx in feature_items], dtype=np.int64)
+            stds = np.full(len(feature_items), feat_std)
+            deltas = np.array(delta_mults)
             
-            # In scaled space, use unit standard deviation to propose deltas
-            feat_std = 1.0
-            current_value = scaled_data[0][feat_idx]
+            coef = _get_identity_linear_coef(model, len(scaled_data[0]))
+            if coef is not None:
+                # Linear model: new_pred - original_pred == coef[feat] * delta exactly
+                results = _cf_search(original_pred, coef, feat_idxs, stds, deltas)
+            else:
+                # Stack every single-feature perturbation and predict them in one call
+                n_deltas = len(deltas)
+                results = np.empty((len(feature_items) * n_deltas, 4))
+                results[:, 0] = np.repeat(np.arange(len(feature_items)), n_deltas)
+                results[:, 1] = np.outer(stds, deltas).ravel()
+                results[:, 3] = np.abs(results[:, 1])
+                cands = np.tile(scaled_data[0], (len(results), 1))
+                cands[np.arange(len(results)), np.repeat(feat_idxs, n_deltas)] += results[:, 1]
+                results[:, 2] = model.predict(cands)
             
-            # Try different deltas
-            for delta_mult in [-0.5, -1.0, -2.0, 0.5, 1.0, 2.0]:
-                delta = delta_mult * feat_std
-                new_value = current_value + delta
-                
-                # Create modified input
-                modified_scaled = scaled_data[0].copy()
-                modified_scaled[feat_idx] = new_value
-                
-                # Predict with modified input
-                new_pred = model.predict(modified_scaled.reshape(1, -1))[0]
-                
+            # Convert whole arrays with tolist() instead of casting each element
+            row = scaled_data[0].tolist()
+            for item_pos, delta, new_pred, distance in results.tolist():
                 # Check if this helps reduce prediction toward target
                 if new_pred < original_pred:
                     reduction = (original_pred - new_pred) / original_pred
-                    
-                    # Calculate normalized distance (L2 norm of change)
-                    change_vector = modified_scaled - scaled_data[0]
-                    distance = np.linalg.norm(change_vector)
+                    feat_name, feat_idx = feature_items[int(item_pos)]
+                    current_value = row[feat_idx]
                     
                     candidates.append({
                         'feature': feat_name,
-                        'original_value': float(current_value),
-                        'suggested_value': float(new_value),
-                        'change': float(delta),
-                        'new_prediction': float(new_pred),
-                        'reduction_percent': float(reduction * 100),
-                        'distance': float(distance)
+                        'original_value': current_value,
+                        'suggested_value': current_value + delta,
+                        'change': delta,
+                        'new_prediction': new_pred,
+                        'reduction_percent': reduction * 100,
+                        'distance': distance
                     })
         
         # Sort by reduction_percent (descending) and distance (ascending)
@@ -520,9 +713,9 @@ def explain_counterfactual():
         # Take top 5 candidates
         top_candidates = candidates[:5]
         
-        return jsonify({
-            'original_prediction': float(original_pred),
-            'target_prediction': float(target_pred),
+        return json_response({
+            'original_prediction': original_pred,
+            'target_prediction': target_pred,
             'candidates': top_candidates
         })
     
@@ -533,7 +726,7 @@ def explain_counterfactual():
             if model is not None and scaler is not None and feature_columns is not None:
                 zeros = np.zeros((1, len(feature_columns)))
                 base_pred = float(model.predict(zeros)[0]) if hasattr(model, 'predict') else 0.0
-                return jsonify({
+                return json_response({
                     'original_prediction': base_pred,
                     'target_prediction': base_pred * 0.8,
                     'candidates': [],
@@ -541,10 +734,47 @@ def explain_counterfactual():
                 })
         except Exception:
             pass
-        return jsonify({
+        return json_response({
             'original_prediction': 0.0,
             'target_prediction': 0.0,
             'candidates': [],
             'note': 'Counterfactual fallback used.'
         })
 
+
+def warm_caches():
+    """Pre-build background data, explainers and the global explanation"""
+    try:
+        model, scaler, feature_columns, _ = get_model_components()
+        if model is None or scaler is None or feature_columns is None:
+            return
+        
+        get_background_data(n_samples=100)
+        _get_scaler_params(scaler)
+        _get_actionable_idx(feature_columns)
+        
+        # Compile the counterfactual search now (with the argument dtypes used
+        # by /explain/cf) rather than on the first user request
+        _cf_search(
+            0.0,
+            np.zeros(1, dtype=np.float32),
+            np.zeros(1, dtype=np.int64),
+            np.ones(1, dtype=np.float64),
+            np.ones(1, dtype=np.float64)
+        )
+        if LIME_AVAILABLE and USE_LIME:
+            get_lime_explainer()
+        
+        if load_cached_global_explanation() is None:
+            explanation = compute_global_explanation(model, feature_columns)
+            if explanation is not None:
+                save_cached_global_explanation(explanation)
+    except Exception as e:
+        print(f"Error warming explainability caches: {e}")
+
+
+@explain_bp.record_once
+def _start_cache_warmup(setup_state):
+    """Warm caches in a background thread so app startup isn't blocked"""
+    if WARM_CACHES:
+        threading.Thread(target=warm_caches, daemon=True).start()
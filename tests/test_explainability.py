@@ -2,8 +2,15 @@
 Tests for explainability endpoints
 """
 
+import os
+import time
+import threading
 import pytest
 import json
+import numpy as np
+from sklearn.linear_model import PoissonRegressor
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+import explainability
 from app import app
 
 
@@ -181,3 +188,159 @@ def test_explain_counterfactual_with_target(client, sample_input):
         # Target prediction should be 0.7 * original
         assert abs(data['target_prediction'] - (data['original_prediction'] * 0.7)) < 0.01
 
+
+def test_background_data_is_cached():
+    """Background data is generated once and reused across calls"""
+    first = explainability.get_background_data(n_samples=100)
+    second = explainability.get_background_data(n_samples=100)
+    if first is not None:
+        assert first is second
+
+
+def test_expired_global_cache_is_ignored(tmp_path, monkeypatch):
+    """A cache file older than the TTL is treated as missing"""
+    cache_file = tmp_path / 'explain_global_cache.json'
+    monkeypatch.setattr(explainability, 'CACHE_FILE', str(cache_file))
+    explainability.save_cached_global_explanation({'feature_importance': []})
+    assert explainability.load_cached_global_explanation() == {'feature_importance': []}
+
+    expired = time.time() - (explainability.CACHE_TTL_DAYS + 1) * 86400
+    os.utime(cache_file, (expired, expired))
+    assert explainability.load_cached_global_explanation() is None
+
+
+def test_concurrent_global_cache_saves(tmp_path, monkeypatch):
+    """Concurrent saves always leave a complete, readable cache file"""
+    cache_file = tmp_path / 'explain_global_cache.json'
+    monkeypatch.setattr(explainability, 'CACHE_FILE', str(cache_file))
+    explanation = {'feature_importance': [{'feature': 'Age', 'mean_abs_shap': 1.0}] * 500}
+
+    threads = [
+        threading.Thread(target=explainability.save_cached_global_explanation, args=(explanation,))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert explainability.load_cached_global_explanation() == explanation
+    assert [p.name for p in tmp_path.iterdir()] == ['explain_global_cache.json']
+
+
+@pytest.fixture
+def components():
+    """Loaded model components; skips when no model is available"""
+    model, scaler, feature_columns, preprocess_input = explainability.get_model_components()
+    if model is None or scaler is None or feature_columns is None:
+        pytest.skip('Model not loaded')
+    return model, scaler, feature_columns, preprocess_input
+
+
+@pytest.fixture
+def scaled_rows(components, sample_input):
+    """A few preprocessed inputs scaled with scale_input"""
+    _, scaler, _, preprocess_input = components
+    inputs = [
+        sample_input['input'],
+        {**sample_input['input'], 'Age': 50, 'Social smoker': 1, 'Reason for absence': 23},
+        {'Age': 28, 'Service time': 2, 'Work load Average/day ': 320.0}
+    ]
+    processed = np.vstack([preprocess_input(x).values for x in inputs]).astype(float)
+    return processed, explainability.scale_input(scaler, processed)
+
+
+def test_scale_input_matches_scaler_transform(components, scaled_rows):
+    """scale_input agrees with StandardScaler.transform"""
+    _, scaler, _, _ = components
+    processed, scaled = scaled_rows
+    np.testing.assert_allclose(scaled, scaler.transform(processed), rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize('scaler', [
+    StandardScaler(with_mean=False),
+    StandardScaler(with_std=False),
+    MinMaxScaler(),
+])
+def test_scale_input_matches_other_scalers(scaler):
+    """scale_input honors StandardScaler options and defers to other scalers"""
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 300, size=(20, 4))
+    scaler.fit(X)
+    np.testing.assert_allclose(
+        explainability.scale_input(scaler, X), scaler.transform(X), rtol=1e-5, atol=1e-4
+    )
+
+
+def test_closed_form_shap_matches_linear_explainer(client, components, sample_input, monkeypatch):
+    """Closed-form local and global SHAP agree with shap.LinearExplainer"""
+    shap = pytest.importorskip('shap')
+    model, scaler, feature_columns, preprocess_input = components
+    monkeypatch.setattr(explainability, 'USE_SHAP', True)
+
+    background = explainability.get_background_data(n_samples=100).astype(np.float64)
+    explainer = shap.LinearExplainer(model, background)
+
+    # Global: mean |SHAP| over the background
+    explanation = explainability.compute_global_explanation(model, feature_columns)
+    expected_global = np.mean(np.abs(explainer.shap_values(background)), axis=0)
+    got_global = {f['feature']: f['mean_abs_shap'] for f in explanation['feature_importance']}
+    np.testing.assert_allclose(
+        [got_global[f] for f in feature_columns], expected_global, rtol=1e-4, atol=1e-5
+    )
+
+    # Local: SHAP values for a single request
+    response = client.post('/explain/local', json=sample_input)
+    contributions = json.loads(response.data)['contributions']
+    got_local = {c['feature']: c['shap'] for c in contributions}
+    row = scaler.transform(preprocess_input(sample_input['input']))[0]
+    expected_local = explainer.shap_values(row)
+    np.testing.assert_allclose(
+        [got_local[f] for f in feature_columns], expected_local, rtol=1e-4, atol=1e-5
+    )
+
+
+def test_cf_search_matches_batched_predict(components, scaled_rows):
+    """Closed-form counterfactual rows agree with predicting each perturbation"""
+    model, _, feature_columns, _ = components
+    coef = explainability._get_identity_linear_coef(model, len(feature_columns))
+    if coef is None:
+        pytest.skip('Model is not an identity-link linear model')
+    row = scaled_rows[1][0]
+    feat_idxs = np.array(
+        list(explainability._get_actionable_idx(feature_columns).values()), dtype=np.int64
+    )
+    stds = np.ones(len(feat_idxs))
+    deltas = np.array([-0.5, -1.0, -2.0, 0.5, 1.0, 2.0])
+
+    results = explainability._cf_search(
+        explainability.predict_row(model, row), coef, feat_idxs, stds, deltas
+    )
+
+    cands = np.tile(row.astype(np.float64), (len(results), 1))
+    changed = feat_idxs[results[:, 0].astype(int)]
+    cands[np.arange(len(results)), changed] += results[:, 1]
+    np.testing.assert_allclose(results[:, 2], model.predict(cands), rtol=1e-5, atol=1e-4)
+    np.testing.assert_allclose(results[:, 3], np.abs(results[:, 1]))
+
+
+def test_non_identity_link_models_use_predict():
+    """GLMs with a 1-D coef_ are predicted with model.predict, not x @ coef"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(50, 3))
+    y = rng.poisson(np.exp(X @ np.array([0.3, -0.2, 0.1]) + 1.0))
+    model = PoissonRegressor().fit(X, y)
+
+    assert explainability._get_identity_linear_coef(model, 3) is None
+    for row in X[:5].astype(np.float32):
+        expected = model.predict(row.reshape(1, -1))[0]
+        assert explainability.predict_row(model, row) == pytest.approx(expected)
+
+
+def test_predict_row_matches_model_predict(components, scaled_rows):
+    """predict_row agrees with model.predict"""
+    model, _, _, _ = components
+    _, scaled = scaled_rows
+    expected = model.predict(scaled.astype(np.float64))
+    for row, pred in zip(scaled, expected):
+        assert explainability.predict_row(model, row) == pytest.approx(pred, rel=1e-5, abs=1e-4)